@@ -2,9 +2,14 @@
 # Modified Agent definitions for the mathematical query handling system.
 
 from crewai import Agent
-from rag_tool import mistral_llm
+from rag_tool import get_llm, get_planner_llm
 from rag_tool import query_discrete_math_rag, query_calculus_rag
 
+# Constructing the agents requires the LLM handles; this is where the lazy
+# LLM singletons (and the API-key check) actually fire
+mistral_llm = get_llm()
+planner_llm = get_planner_llm()
+
 # Planner Agent (Coordinator)
 planner_agent = Agent(
     role="Mathematical Query Coordinator",
@@ -20,7 +25,7 @@ planner_agent = Agent(
     You are decisive and route ALL queries to one of these two specialists.""",
     verbose=True,
     allow_delegation=False,
-    llm=mistral_llm
+    llm=planner_llm  # JSON-constrained, short-completion LLM for routing
 )
 
 # Worker Agent 1: Discrete Math Specialist
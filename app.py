@@ -6,21 +6,84 @@ with Periodic Reflection and No Unrelated Query Handling
 
 import streamlit as st
 import json
+import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 
-# Add current directory to Python path
-current_dir = Path(__file__).parent
-sys.path.insert(0, str(current_dir))
+# Add current directory to Python path (once - the script re-executes on
+# every Streamlit interaction)
+current_dir = str(Path(__file__).parent)
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
 
-from planner import Planner, Executor
-from reflective import Reflector
+# Cache the pipeline imports so CrewAI agent/crew construction (pydantic
+# validation, tool binding, LLM client setup) survives Streamlit reruns
+@st.cache_resource
+def load_pipeline():
+    """Import and cache the planner/executor classes once per process."""
+    from planner import Planner, Executor
+    return Planner, Executor
+
+@st.cache_resource
+def get_reflector():
+    """
+    Lazily import and cache the Reflector.
+
+    Reflection only fires every N days, so the import (and the reflection
+    crew it builds) is deferred until a run that actually needs it.
+    """
+    from reflective import Reflector
+    return Reflector
+
+@st.cache_resource
+def get_rag_tools():
+    """Cache the raw RAG tool callables for speculative prefetch."""
+    from rag_tool import query_discrete_math_rag, query_calculus_rag
+
+    def unwrap(tool):
+        # CrewAI's @tool wraps the function; grab the underlying callable
+        return getattr(tool, "func", None) or getattr(tool, "run", tool)
+
+    return unwrap(query_discrete_math_rag), unwrap(query_calculus_rag)
+
+@st.cache_resource
+def get_prefetch_pool():
+    """Shared thread pool for speculative RAG prefetch."""
+    return ThreadPoolExecutor(max_workers=2)
+
+# Precompiled parsing helpers - built once per process, not per submit
+_JSON_DECODER = json.JSONDecoder()
+SCORE_RE = re.compile(r'QUALITY SCORE:\s*(\d+)')
+
+# Reflection state is persisted to disk so browser refreshes and new
+# sessions honor the "every N days" schedule instead of re-triggering an
+# LLM reflection on every fresh session
+REFLECTION_STATE_FILE = Path("reflection_state.json")
+
+def _load_reflection_state():
+    """Load the last reflection date from disk (None if never run)."""
+    try:
+        data = json.loads(REFLECTION_STATE_FILE.read_text())
+        return datetime.fromisoformat(data["last_reflection"])
+    except (OSError, ValueError, KeyError, TypeError):
+        # TypeError covers non-string values (e.g. a null last_reflection)
+        return None
+
+def _save_reflection_state(last_reflection):
+    """Persist the last reflection date atomically (write temp + rename)."""
+    try:
+        tmp_path = REFLECTION_STATE_FILE.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"last_reflection": last_reflection.isoformat()}))
+        os.replace(tmp_path, REFLECTION_STATE_FILE)
+    except OSError as e:
+        print(f"Could not persist reflection state: {str(e)}")
 
 # Initialize session state for reflection scheduling
 if 'last_reflection_date' not in st.session_state:
-    st.session_state.last_reflection_date = None
+    st.session_state.last_reflection_date = _load_reflection_state()
 if 'query_count' not in st.session_state:
     st.session_state.query_count = 0
 if 'reflection_interval_days' not in st.session_state:
@@ -147,90 +210,168 @@ if st.button("🚀 Submit Query", type="primary"):
     else:
         # Increment query counter
         st.session_state.query_count += 1
+
+        # Heavy imports (CrewAI, langchain, RAG init) only happen on the
+        # first actual submit, never on page-render reruns
+        Planner, Executor = load_pipeline()
         
+        # Speculatively prefetch RAG context for BOTH routes while the router
+        # decides - retrieval is independent of the routing decision, so its
+        # latency hides inside the router's latency
+        dm_rag, calc_rag = get_rag_tools()
+        pool = get_prefetch_pool()
+        dm_prefetch = pool.submit(dm_rag, user_query)
+        calc_prefetch = pool.submit(calc_rag, user_query)
+
         # Step 1: Planning
         st.markdown("---")
         st.markdown("### 📋 Step 1: Query Analysis & Routing")
-        
-        with st.spinner("Analyzing query..."):
-            try:
-                planning_result = Planner.analyze_and_route(user_query)
-            except Exception as e:
-                st.error(f"❌ Error during query analysis: {str(e)}")
-                st.stop()
-        
-        # Parse the planning result
+
+        # LLM-free routing first (cache + keyword classifier); ambiguous
+        # queries go to the fused hierarchical crew, which routes AND answers
+        # in a single kickoff instead of separate router + specialist calls
         try:
-            # Extract text from CrewOutput
-            if hasattr(planning_result, 'raw'):
-                result_text = planning_result.raw
-            elif hasattr(planning_result, 'tasks_output') and planning_result.tasks_output:
-                result_text = planning_result.tasks_output[0].raw
-            else:
-                result_text = str(planning_result)
-            
-            # Try to find JSON in the text
-            json_match = re.search(r'\{[^}]+\}', result_text)
-            if json_match:
-                route_info = json.loads(json_match.group())
-            else:
-                # Fallback: try to determine route from text
-                result_lower = result_text.lower()
-                if 'discrete' in result_lower:
-                    route_info = {"route": "discrete_math", "reasoning": result_text}
-                else:
-                    route_info = {"route": "calculus", "reasoning": result_text}
+            planning_result = Planner.fast_route(user_query)
         except Exception as e:
-            st.error(f"❌ Error parsing routing decision: {str(e)}")
-            # Default to calculus as fallback
-            route_info = {"route": "calculus", "reasoning": "Could not parse routing decision - defaulting to calculus"}
-        
+            st.error(f"❌ Error during query analysis: {str(e)}")
+            st.stop()
+
+        if planning_result is None:
+            route_info = {
+                "route": "fused",
+                "reasoning": "Keywords are ambiguous - the fused crew's manager "
+                             "will route this query while answering it"
+            }
+        else:
+            # Parse the planning result
+            try:
+                # Extract text from CrewOutput
+                if hasattr(planning_result, 'raw'):
+                    result_text = planning_result.raw
+                elif hasattr(planning_result, 'tasks_output') and planning_result.tasks_output:
+                    result_text = planning_result.tasks_output[0].raw
+                else:
+                    result_text = str(planning_result)
+
+                # Find the first parseable JSON object with a bracket-balanced
+                # raw_decode sweep (a regex truncates nested braces)
+                route_info = None
+                for i, ch in enumerate(result_text):
+                    if ch != '{':
+                        continue
+                    try:
+                        route_info, _ = _JSON_DECODER.raw_decode(result_text, i)
+                        break
+                    except json.JSONDecodeError:
+                        continue
+
+                if not isinstance(route_info, dict):
+                    # Fallback: try to determine route from text
+                    result_lower = result_text.lower()
+                    if 'discrete' in result_lower:
+                        route_info = {"route": "discrete_math", "reasoning": result_text}
+                    else:
+                        route_info = {"route": "calculus", "reasoning": result_text}
+            except Exception as e:
+                st.error(f"❌ Error parsing routing decision: {str(e)}")
+                # Default to calculus as fallback
+                route_info = {"route": "calculus", "reasoning": "Could not parse routing decision - defaulting to calculus"}
+
         route = route_info.get("route", "calculus")
         reasoning = route_info.get("reasoning", "No reasoning provided")
-        
+
         # Display routing decision
         col1, col2 = st.columns([1, 3])
         with col1:
             if route == "discrete_math":
                 st.markdown('<span class="route-badge discrete-math">📊 Discrete Math</span>', unsafe_allow_html=True)
+            elif route == "fused":
+                st.markdown('<span class="route-badge calculus">🧭 Fused Crew</span>', unsafe_allow_html=True)
             else:
                 st.markdown('<span class="route-badge calculus">📈 Calculus</span>', unsafe_allow_html=True)
-        
+
         with col2:
             st.info(f"**Reasoning:** {reasoning}")
-        
+
+        if route == "fused":
+            # The manager picks the specialist internally; drop both prefetches
+            dm_prefetch.cancel()
+            calc_prefetch.cancel()
+            prefetched_context = None
+        else:
+            # Collect the winning prefetch and discard the loser
+            winner = dm_prefetch if route == "discrete_math" else calc_prefetch
+            loser = calc_prefetch if route == "discrete_math" else dm_prefetch
+            loser.cancel()
+            try:
+                prefetched_context = winner.result(timeout=60)
+            except Exception as e:
+                print(f"RAG prefetch failed, agent will call the tool itself: {str(e)}")
+                prefetched_context = None
+
         # Step 2: Execution
         st.markdown("### ⚙️ Step 2: Query Execution")
-        
-        with st.spinner(f"Processing with {route.replace('_', ' ').title()} Agent..."):
-            if route == "discrete_math":
-                execution_result = Executor.execute_discrete_math_query(user_query)
-            else:  # calculus
-                execution_result = Executor.execute_calculus_query(user_query)
-        
-        # Extract answer text from CrewOutput
-        if hasattr(execution_result, 'raw'):
-            answer_text = execution_result.raw
-        elif hasattr(execution_result, 'tasks_output') and execution_result.tasks_output:
-            answer_text = execution_result.tasks_output[0].raw
+
+        execution_result = None
+        answer_text = None
+
+        if route == "fused":
+            with st.spinner("Processing with Fused Planner+Specialist Crew..."):
+                execution_result = Planner.route_and_answer(user_query)
+        elif prefetched_context:
+            # RAG work is already done, so the rest is a single completion -
+            # stream it token-by-token instead of blocking behind a spinner
+            try:
+                st.markdown("#### 💡 Answer:")
+                answer_text = st.write_stream(
+                    Executor.execute_stream(route, user_query, prefetched_context)
+                )
+            except Exception as e:
+                print(f"Streaming failed, falling back to crew execution: {str(e)}")
+                answer_text = None
+
+        if execution_result is None and answer_text is None:
+            with st.spinner(f"Processing with {route.replace('_', ' ').title()} Agent..."):
+                if route == "discrete_math":
+                    execution_result = Executor.execute_discrete_math_query(
+                        user_query, prefetched_context=prefetched_context)
+                else:  # calculus
+                    execution_result = Executor.execute_calculus_query(
+                        user_query, prefetched_context=prefetched_context)
+
+        if answer_text is None:
+            # Extract answer text from CrewOutput
+            if hasattr(execution_result, 'raw'):
+                answer_text = execution_result.raw
+            elif hasattr(execution_result, 'tasks_output') and execution_result.tasks_output:
+                answer_text = execution_result.tasks_output[0].raw
+            else:
+                answer_text = str(execution_result)
+
+            st.success("✅ Answer Generated")
+            st.markdown("#### 💡 Answer:")
+            st.markdown(answer_text)
         else:
-            answer_text = str(execution_result)
-        
-        st.success("✅ Answer Generated")
-        st.markdown("#### 💡 Answer:")
-        st.markdown(answer_text)
-        
+            st.success("✅ Answer Generated")
+
+        # Start reflection in the background as soon as the answer text is
+        # final: the evaluation LLM call runs while the remaining UI renders,
+        # and the script blocks only where the score is actually displayed
+        run_reflection = should_run_reflection()
+        reflection_future = None
+        if run_reflection:
+            Reflector = get_reflector()
+            reflection_future = Reflector.evaluate_answer_async(user_query, answer_text, route)
+
         # Step 3: Periodic Reflection
         st.markdown("### 🔍 Step 3: Quality Assessment")
-        
-        run_reflection = should_run_reflection()
-        
+
         if run_reflection:
             st.markdown('<div class="reflection-info">⏰ <strong>Scheduled reflection time reached!</strong> Running quality assessment...</div>', unsafe_allow_html=True)
-            
+
             with st.spinner("Evaluating answer quality..."):
-                reflection_result = Reflector.evaluate_answer(user_query, answer_text, route)
-            
+                reflection_result = reflection_future.result()
+
             # Extract reflection text from CrewOutput
             if hasattr(reflection_result, 'raw'):
                 reflection_text = reflection_result.raw
@@ -240,7 +381,7 @@ if st.button("🚀 Submit Query", type="primary"):
                 reflection_text = str(reflection_result)
             
             # Parse quality score
-            score_match = re.search(r'QUALITY SCORE:\s*(\d+)', reflection_text)
+            score_match = SCORE_RE.search(reflection_text)
             quality_score = int(score_match.group(1)) if score_match else 0
             
             # Display quality metrics
@@ -252,8 +393,9 @@ if st.button("🚀 Submit Query", type="primary"):
             with st.expander("📊 Detailed Quality Assessment", expanded=True):
                 st.markdown(reflection_text)
             
-            # Update last reflection date
+            # Update last reflection date (in session and on disk)
             st.session_state.last_reflection_date = datetime.now()
+            _save_reflection_state(st.session_state.last_reflection_date)
             st.success(f"✅ Reflection completed. Next reflection in {st.session_state.reflection_interval_days} days.")
             
         else:
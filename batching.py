@@ -0,0 +1,79 @@
+# batching.py
+"""
+Bounded async batch scheduler for concurrent LLM calls.
+
+Collects prompts submitted within a small time window and dispatches them
+together as parallel completions under a concurrency cap, so an
+OpenAI-compatible backend with continuous batching (vLLM, or Ollama with
+OLLAMA_NUM_PARALLEL > 1) sees the whole batch at once instead of a serial
+trickle of requests.
+"""
+
+import asyncio
+
+import litellm
+
+
+class BatchScheduler:
+    """Collects requests for a short window, then dispatches them together."""
+
+    def __init__(self, model: str, api_key: str = None,
+                 max_batch_size: int = 8, batch_window_ms: int = 10,
+                 max_concurrency: int = 8):
+        self.model = model  # litellm model name
+        self.api_key = api_key  # API key for the backend
+        self.max_batch_size = max_batch_size  # Max requests per window
+        self.batch_window_ms = batch_window_ms  # Collection window
+        self.semaphore = asyncio.Semaphore(max_concurrency)  # In-flight cap
+        self.queue = asyncio.Queue()  # Pending (messages, kwargs, future)
+        self._drain_task = None  # Background drain task (lazily started)
+
+    async def submit(self, messages, **kwargs) -> str:
+        """
+        Queue one chat request; resolves to the completion text.
+
+        Requests submitted within batch_window_ms of each other are fired
+        as one batch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((messages, kwargs, future))
+
+        # Start (or restart) the background drain loop
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+
+        return await future
+
+    async def _drain(self):
+        """Drain the queue in windows of up to max_batch_size requests."""
+        while not self.queue.empty():
+            # Give near-simultaneous callers a moment to join the batch
+            await asyncio.sleep(self.batch_window_ms / 1000.0)
+
+            batch = []
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            if not batch:
+                return
+
+            # Fire the whole window at once; the semaphore caps in-flight
+            # requests at what the backend can actually run in parallel
+            await asyncio.gather(
+                *(self._dispatch(messages, kwargs, future)
+                  for messages, kwargs, future in batch)
+            )
+
+    async def _dispatch(self, messages, kwargs, future):
+        """Send one request and resolve its future."""
+        async with self.semaphore:
+            try:
+                response = await litellm.acompletion(
+                    model=self.model,
+                    api_key=self.api_key,
+                    messages=messages,
+                    **kwargs
+                )
+                future.set_result(response.choices[0].message.content)
+            except Exception as e:
+                future.set_exception(e)
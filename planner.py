@@ -3,12 +3,324 @@
 Modified Planner: Routes queries to discrete math or calculus agents only.
 """
 
+import asyncio
+import functools
+import json
+import re
+import string
+import threading
+from collections import OrderedDict
+
+import litellm
+import numpy as np
 from crewai import Crew, Task, Process
 from agents import planner_agent, discrete_math_agent, calculus_agent
+from rag_tool import get_rag_system, get_llm, MISTRAL_API_KEY
+
+# Route cache configuration
+ROUTE_CACHE_SIZE = 4096       # Max exact-match entries before LRU eviction
+SIMILARITY_THRESHOLD = 0.92   # Cosine similarity required for a fuzzy cache hit
+
+
+def _normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (lowercase, collapse punctuation)."""
+    return re.sub(r'\W+', ' ', query.lower()).strip()
+
+
+class RouteCache:
+    """
+    LRU cache of per-query results with an embedding-similarity fallback.
+
+    Exact hits are served from a normalized-string LRU dict. On an exact miss,
+    the query is embedded with the shared RAG embedding model and compared
+    against embeddings of previously cached queries; a cosine similarity at or
+    above SIMILARITY_THRESHOLD reuses the prior result. Only genuine misses
+    reach the LLM. The similarity arrays are evicted in lockstep with the
+    exact entries, so memory stays bounded by maxsize.
+
+    All lookups and stores run under a per-instance lock: Streamlit runs
+    concurrent sessions as threads of one process (the same threat model the
+    shared-crew locks guard against), and an interleaved put/evict could
+    desync the parallel keys/vectors/results lists - turning a similarity
+    hit into the cached answer for a different query.
+    """
+
+    def __init__(self, maxsize: int = ROUTE_CACHE_SIZE, label: str = "Route"):
+        self.maxsize = maxsize
+        self.label = label          # log prefix ("Route", "Answer", ...)
+        self.exact = OrderedDict()  # normalized query -> cached result text
+        self.keys = []              # normalized queries, parallel to vectors
+        self.vectors = []           # unit embeddings of past queries
+        self.results = []           # cached result text, parallel to vectors
+        self._pending = {}          # miss-path vectors awaiting their put()
+        self._lock = threading.Lock()
+
+    def get(self, query: str):
+        """Return a cached result, or None on a genuine miss."""
+        key = _normalize_query(query)
+
+        with self._lock:
+            # Exact match first - plain dict lookup
+            if key in self.exact:
+                self.exact.move_to_end(key)
+                print(f"{self.label} cache HIT (exact): {key[:60]}")
+                return self.exact[key]
+
+            # Fuzzy match via embedding similarity; with nothing to compare
+            # against, skip the forward pass entirely
+            if not self.vectors:
+                return None
+
+            vec = self._embed(key)
+            if vec is None:
+                return None
+            sims = np.array(self.vectors) @ vec
+            best = int(np.argmax(sims))
+            if sims[best] >= SIMILARITY_THRESHOLD:
+                print(f"{self.label} cache HIT (similar, cos={sims[best]:.3f}): {key[:60]}")
+                return self.results[best]
+
+            # Genuine miss: keep the vector for the put() that typically
+            # follows, so the same query is not embedded twice
+            if len(self._pending) > 64:
+                self._pending.clear()
+            self._pending[key] = vec
+
+        return None
+
+    def put(self, query: str, result_text: str):
+        """Store a result under both the exact and fuzzy lookups."""
+        key = _normalize_query(query)
+        with self._lock:
+            self.exact[key] = result_text
+            self.exact.move_to_end(key)
+            while len(self.exact) > self.maxsize:
+                evicted, _ = self.exact.popitem(last=False)
+                self._drop_vector(evicted)
+
+            # Reuse the vector computed by the get() that preceded this
+            # store; only embed when there is none (e.g. first-ever entry)
+            vec = self._pending.pop(key, None)
+            if vec is None:
+                vec = self._embed(key)
+            if vec is None:
+                return
+            if key in self.keys:
+                # Refresh in place rather than growing a duplicate entry
+                i = self.keys.index(key)
+                self.vectors[i] = vec
+                self.results[i] = result_text
+            else:
+                self.keys.append(key)
+                self.vectors.append(vec)
+                self.results.append(result_text)
+
+    def _drop_vector(self, key: str):
+        """Remove the similarity-arrays entry for an evicted exact key."""
+        try:
+            i = self.keys.index(key)
+        except ValueError:
+            return
+        del self.keys[i]
+        del self.vectors[i]
+        del self.results[i]
+
+    def _embed(self, text: str):
+        """Embed text with the shared RAG embedding model (unit-normalized)."""
+        rag = get_rag_system()
+        if not rag.db_initialized or rag.embeddings is None:
+            return None
+        try:
+            vec = np.asarray(rag.embeddings.embed_query(text), dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm > 0 else None
+        except Exception as e:
+            print(f"Route cache embedding failed: {str(e)}")
+            return None
+
+
+# Single cache instance shared across all routing calls
+_route_cache = RouteCache()
+
+# Fused-path answers are cached too: queries the fast path cannot resolve
+# cost a full hierarchical crew run, so repeats and near-duplicate
+# rephrasings skip the crew entirely
+_answer_cache = RouteCache(label="Answer")
+
+# Keyword pre-classifier configuration. The two topic vocabularies are highly
+# discriminative, so an O(n) regex scan resolves most queries without an LLM
+# call; ambiguous queries fall through to the planner crew.
+KEYWORD_ROUTE_MARGIN = 2  # Lead required when BOTH vocabularies match
+DM_RE = re.compile(
+    r'\b(permut|combinat|graph|set|logic|proof|recurr|boolean|counting|'
+    r'induction|modulo|prime|divisib)\w*\b', re.I)
+CALC_RE = re.compile(
+    r'\b(deriv|integr|limit|continu|differenti|converg|multivariable|'
+    r'optimiz|antiderivative|tangent)\w*\b', re.I)
+
+
+@functools.lru_cache(maxsize=None)
+def _planner_crew():
+    """
+    Build the routing crew once per process.
+
+    Crew/Task construction pays pydantic validation and agent binding on
+    every call; building once and swapping the task description per query
+    makes per-request setup nearly free. The lock serializes the
+    description-swap+kickoff section: Streamlit runs concurrent sessions in
+    threads of one process, so an unguarded swap could answer the wrong
+    user's question.
+    """
+    task = Task(
+        description="",
+        agent=planner_agent,
+        expected_output="JSON object with route and reasoning"
+    )
+    crew = Crew(
+        agents=[planner_agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=False
+    )
+    return crew, task, threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _fused_crew():
+    """
+    Build the fused routing+answering crew once per process.
+
+    One hierarchical crew whose manager LLM delegates to the right
+    specialist replaces the separate router and executor kickoffs - one
+    network round-trip and one agent bootstrap instead of two. The lock
+    guards the shared task against concurrent description swaps.
+    """
+    task = Task(
+        description="",
+        expected_output="Complete answer with clear knowledge source indication"
+    )
+    crew = Crew(
+        agents=[discrete_math_agent, calculus_agent],
+        tasks=[task],
+        process=Process.hierarchical,
+        manager_llm=get_llm(),
+        verbose=True
+    )
+    return crew, task, threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _executor_crew(route: str):
+    """
+    Build the specialist crew for a route once per process.
+
+    The per-route lock serializes concurrent users of the shared task;
+    callers that need real parallelism use Executor._fresh_crew instead.
+    """
+    spec = _ROUTES[route]  # defined below with the task template
+    task = Task(
+        description="",
+        agent=spec["agent"],
+        expected_output=spec["expected_output"]
+    )
+    crew = Crew(
+        agents=[spec["agent"]],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=True
+    )
+    return crew, task, threading.Lock()
 
 class Planner:
     """Handles the routing of mathematical queries to appropriate specialists."""
 
+    @staticmethod
+    def _keyword_route(user_query: str):
+        """
+        Classify a query by topic keywords when the vocabulary is decisive.
+
+        A one-sided match (keywords from one topic, none from the other) is
+        decisive on its own - "derivative of x^2" needs no LLM to route.
+        Only when BOTH vocabularies match is a KEYWORD_ROUTE_MARGIN lead
+        required. Returns a routing JSON string, or None when no keywords
+        match or the counts are too close to call.
+        """
+        dm_count = len(DM_RE.findall(user_query))
+        calc_count = len(CALC_RE.findall(user_query))
+
+        if dm_count == calc_count:
+            # Covers 0-0 (no signal) and genuine ties
+            return None
+        if dm_count and calc_count and abs(dm_count - calc_count) < KEYWORD_ROUTE_MARGIN:
+            return None
+
+        route = "discrete_math" if dm_count > calc_count else "calculus"
+        print(f"Keyword classifier routed to {route} "
+              f"(discrete_math={dm_count}, calculus={calc_count})")
+        return json.dumps({
+            "route": route,
+            "reasoning": f"Keyword classifier: {dm_count} discrete math vs "
+                         f"{calc_count} calculus keyword matches"
+        })
+
+    @staticmethod
+    def fast_route(user_query: str):
+        """
+        LLM-free routing: cache lookup, then keyword classifier.
+
+        Returns a routing JSON string, or None when the query is ambiguous
+        and an LLM (separate router or fused crew) is needed.
+        """
+        cached = _route_cache.get(user_query)
+        if cached is not None:
+            return cached
+
+        keyword_result = Planner._keyword_route(user_query)
+        if keyword_result is not None:
+            _route_cache.put(user_query, keyword_result)
+        return keyword_result
+
+    @staticmethod
+    def route_and_answer(user_query: str):
+        """
+        Route AND answer a query in a single hierarchical crew kickoff.
+
+        Used for queries the LLM-free fast path cannot resolve: instead of
+        one kickoff to pick the specialist and a second to answer, the
+        manager LLM delegates to the right specialist inside one crew run.
+        Outcomes are cached, so repeats and near-duplicate rephrasings of a
+        fused-path query return the stored answer without a crew run.
+        """
+        cached = _answer_cache.get(user_query)
+        if cached is not None:
+            return cached  # plain string; callers already handle str results
+
+        crew, task, lock = _fused_crew()
+
+        try:
+            print("\n🔄 EXECUTING FUSED ROUTING+ANSWER CREW")
+            with lock:
+                task.description = f"""
+Answer this mathematical question:
+
+{user_query}
+
+First decide whether it is a discrete mathematics question (logic, proofs,
+set theory, combinatorics, graph theory, number theory, discrete
+probability, recurrences, boolean algebra) or a calculus question (limits,
+derivatives, integrals, differential equations, series, multivariable
+calculus, optimization), then delegate it to that specialist and return
+their complete answer, including the knowledge source they used.
+"""
+                result = crew.kickoff()
+            print("✅ QUERY EXECUTION COMPLETED\n")
+            _answer_cache.put(user_query, getattr(result, 'raw', str(result)))
+            return result
+
+        except Exception as e:
+            print(f"\n❌ ERROR: {str(e)}\n")
+            return ErrorResult(str(e))
+
     @staticmethod
     def analyze_and_route(user_query: str):
         """
@@ -18,79 +330,62 @@ class Planner:
         Returns:
             dict with 'route' (discrete_math or calculus) and 'reasoning'
         """
-        task = Task(
-            description=f"""
-            Analyze this mathematical query and determine which specialist should handle it:
-            
+        # Cheap paths first: cached decisions and the keyword classifier
+        fast_result = Planner.fast_route(user_query)
+        if fast_result is not None:
+            return fast_result
+
+        crew, task, lock = _planner_crew()
+        description = f"""
+            Classify this mathematical query for routing:
+
             Query: {user_query}
-            
-            You must classify this query into ONE of the following categories:
-            
-            1. "discrete_math" - For questions about:
-               - Logic and proofs
-               - Set theory
-               - Combinatorics (counting, permutations, combinations)
-               - Graph theory
-               - Number theory
-               - Probability (discrete)
-               - Relations and functions
-               - Sequences and recurrence relations
-               - Boolean algebra
-            
-            2. "calculus" - For questions about:
-               - Limits and continuity
-               - Derivatives and differentiation
-               - Integrals and integration
-               - Differential equations
-               - Series and sequences (convergence/divergence)
-               - Multivariable calculus
-               - Optimization problems
-               - Related rates
-            
-            IMPORTANT: Every query must be classified as either discrete_math or calculus.
-            If a query has elements of both, choose the one that is more dominant.
-            If the query is not clearly mathematical, make your best judgment based on 
-            which specialist would be better suited to handle it.
-            
-            Respond with ONLY a JSON object in this exact format:
-            {{
-                "route": "discrete_math" or "calculus",
-                "reasoning": "Brief explanation of why this classification was chosen"
-            }}
-            
-            Do not include any other text, explanations, or formatting outside the JSON.
-            """,
-            agent=planner_agent,
-            expected_output="JSON object with route and reasoning"
-        )
 
-        crew = Crew(
-            agents=[planner_agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=False
-        )
-        
-        result = crew.kickoff()
+            Categories:
+            1. "discrete_math" - logic, proofs, set theory, combinatorics
+               (counting, permutations, combinations), graph theory, number
+               theory, discrete probability, relations, recurrences, boolean algebra
+            2. "calculus" - limits, continuity, derivatives, integrals,
+               differential equations, series convergence, multivariable
+               calculus, optimization, related rates
+
+            Every query must be classified as either discrete_math or calculus.
+            If it has elements of both, choose the dominant one.
+
+            Respond with ONLY this minified JSON, nothing else:
+            {{"route": "discrete_math" or "calculus", "reasoning": "one short sentence"}}
+            """
+
+        with lock:
+            task.description = description
+            result = crew.kickoff()
+        _route_cache.put(user_query, getattr(result, 'raw', str(result)))
         return result
 
-class Executor:
-    """Handles query execution with RAG retrieval and LLM fallback."""
+def _with_prefetched_context(description: str, prefetched_context: str) -> str:
+    """Append already-retrieved RAG output so the agent skips its tool call."""
+    return description + f"""
 
-    @staticmethod
-    def execute_discrete_math_query(user_query: str):
-        """Execute discrete math query with RAG tool usage."""
-        
-        task = Task(
-            description=f"""
-You are answering a discrete mathematics question. Follow these steps EXACTLY:
+⚡ PREFETCHED TOOL OUTPUT
+The retrieval tool has ALREADY been called for this question. Its output
+is below - use it directly and DO NOT call the tool again:
+
+{prefetched_context}
+"""
+
+
+# The two specialist prompts are ~90% identical; keep ONE pre-baked template
+# at module scope and specialize it per route at call time instead of
+# reallocating two multi-KB near-duplicate strings.
+_TASK_TEMPLATE = """
+You are answering a {topic} question. Follow these steps EXACTLY:
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-QUESTION: {user_query}
+QUESTION: {question}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 🔍 STEP 1: RETRIEVE FROM KNOWLEDGE BASE
-You MUST call the query_discrete_math_rag tool with the question.
+You MUST call the {tool_name} tool with the question.
 DO NOT skip this step.
 
 📋 STEP 2: CHECK RAG RESULTS
@@ -112,126 +407,248 @@ If RAG retrieval was successful:
 
 ---
 
-If RAG retrieval failed:
+If RAG retrieval failed{failed_qualifier}:
 
 **🤖 KNOWLEDGE SOURCE: Mistral LLM General Knowledge**
-ℹ️ Note: Could not find relevant information in the knowledge base for this query.
+ℹ️ Note: {fallback_note}
 
 **💡 ANSWER:**
-[Your answer using general knowledge with step-by-step explanation]
+{fallback_answer_format}
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 CRITICAL RULES:
-✓ You MUST call query_discrete_math_rag tool first
-✓ If RAG context is provided, you MUST use it (not your general knowledge)
-✓ Always be explicit about whether you're using RAG or LLM knowledge
-✓ Include source citations when using RAG
-✓ Provide clear, step-by-step explanations
-""",
-            agent=discrete_math_agent,
-            expected_output="Complete answer with clear knowledge source indication and citations"
-        )
+✓ You MUST call {tool_name} tool first
+{extra_rules}
+"""
 
-        crew = Crew(
-            agents=[discrete_math_agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
+# Per-route specialization of the shared template plus crew wiring
+_ROUTES = {
+    "discrete_math": {
+        "agent": discrete_math_agent,
+        "expected_output": "Complete answer with clear knowledge source indication and citations",
+        "topic": "discrete mathematics",
+        "tool_name": "query_discrete_math_rag",
+        "failed_qualifier": "",
+        "fallback_note": "Could not find relevant information in the knowledge base for this query.",
+        "fallback_answer_format": "[Your answer using general knowledge with step-by-step explanation]",
+        "extra_rules": (
+            "✓ If RAG context is provided, you MUST use it (not your general knowledge)\n"
+            "✓ Always be explicit about whether you're using RAG or LLM knowledge\n"
+            "✓ Include source citations when using RAG\n"
+            "✓ Provide clear, step-by-step explanations"
+        ),
+    },
+    "calculus": {
+        "agent": calculus_agent,
+        "expected_output": "Complete step-by-step calculus solution",
+        "topic": "calculus",
+        "tool_name": "query_calculus_rag",
+        "failed_qualifier": " (currently expected for calculus)",
+        "fallback_note": "Calculus knowledge base not yet available.",
+        "fallback_answer_format": (
+            "[Provide complete step-by-step solution]\n"
+            "\n"
+            "**📝 SOLUTION STEPS:**\n"
+            "1. [Step 1 with explanation]\n"
+            "2. [Step 2 with explanation]\n"
+            "...\n"
+            "\n"
+            "**🎯 FINAL ANSWER:**\n"
+            "[Clear final answer]"
+        ),
+        "extra_rules": (
+            "✓ Show all mathematical steps\n"
+            "✓ Explain reasoning for each step\n"
+            "✓ Be clear about using LLM knowledge"
+        ),
+    },
+}
+
+
+# Pre-render each route's prompt once at import time: every slot except the
+# question is static, so per-request work drops from a seven-slot format of a
+# multi-KB string to a single $question substitution.
+_ROUTE_PROMPTS = {
+    route: string.Template(
+        _TASK_TEMPLATE.format(
+            topic=spec["topic"],
+            question="$question",
+            tool_name=spec["tool_name"],
+            failed_qualifier=spec["failed_qualifier"],
+            fallback_note=spec["fallback_note"],
+            fallback_answer_format=spec["fallback_answer_format"],
+            extra_rules=spec["extra_rules"],
         )
-        
-        try:
-            print("\n🔄 EXECUTING DISCRETE MATH QUERY")
-            result = crew.kickoff()
-            print("✅ QUERY EXECUTION COMPLETED\n")
-            return result
+    )
+    for route, spec in _ROUTES.items()
+}
 
-        except Exception as e:
-            print(f"\n❌ ERROR: {str(e)}\n")
-            class ErrorResult:
-                def __init__(self, error_msg):
-                    self.raw = f"❌ Error executing query: {error_msg}"
-            return ErrorResult(str(e))
 
-    @staticmethod
-    def execute_calculus_query(user_query: str):
-        """Execute calculus query with RAG tool usage."""
-        
-        task = Task(
-            description=f"""
-You are answering a calculus question. Follow these steps EXACTLY:
+def _task_description(route: str, user_query: str, prefetched_context=None) -> str:
+    """Build the specialist task description for a route."""
+    description = _ROUTE_PROMPTS[route].substitute(question=user_query)
+    if prefetched_context:
+        description = _with_prefetched_context(description, prefetched_context)
+    return description
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-QUESTION: {user_query}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-🔍 STEP 1: RETRIEVE FROM KNOWLEDGE BASE
-You MUST call the query_calculus_rag tool with the question.
-DO NOT skip this step.
+class ErrorResult:
+    """Lightweight result wrapper mirroring CrewOutput's .raw on errors."""
 
-📋 STEP 2: CHECK RAG RESULTS
-After calling the tool:
-- If "RAG RETRIEVAL SUCCESSFUL" → Use ONLY the retrieved context to answer
-- If "RAG RETRIEVAL FAILED" → Use your Mistral LLM general knowledge
+    def __init__(self, error_msg):
+        self.raw = f"❌ Error executing query: {error_msg}"
 
-✍️ STEP 3: FORMAT YOUR RESPONSE
 
-If RAG retrieval was successful:
+class Executor:
+    """Handles query execution with RAG retrieval and LLM fallback."""
 
-**📚 KNOWLEDGE SOURCE: Knowledge Base (RAG)**
+    @staticmethod
+    def execute(route: str, user_query: str, prefetched_context=None):
+        """Execute a query with the specialist crew for the given route."""
 
-**💡 ANSWER:**
-[Your complete answer based on the retrieved context]
+        crew, task, lock = _executor_crew(route)
 
-**📖 SOURCES USED:**
-[List the sources from the RAG tool output]
+        try:
+            print(f"\n🔄 EXECUTING {route.upper()} QUERY")
+            with lock:
+                task.description = _task_description(route, user_query, prefetched_context)
+                result = crew.kickoff()
+            print("✅ QUERY EXECUTION COMPLETED\n")
+            return result
 
----
+        except Exception as e:
+            print(f"\n❌ ERROR: {str(e)}\n")
+            return ErrorResult(str(e))
 
-If RAG retrieval failed (currently expected for calculus):
+    @staticmethod
+    def execute_discrete_math_query(user_query: str, prefetched_context=None):
+        """Execute discrete math query with RAG tool usage."""
+        return Executor.execute("discrete_math", user_query, prefetched_context)
 
-**🤖 KNOWLEDGE SOURCE: Mistral LLM General Knowledge**
-ℹ️ Note: Calculus knowledge base not yet available.
+    @staticmethod
+    def execute_calculus_query(user_query: str, prefetched_context=None):
+        """Execute calculus query with RAG tool usage."""
+        return Executor.execute("calculus", user_query, prefetched_context)
 
-**💡 ANSWER:**
-[Provide complete step-by-step solution]
+    @staticmethod
+    def execute_stream(route: str, user_query: str, prefetched_context: str):
+        """
+        Stream the specialist answer token-by-token.
 
-**📝 SOLUTION STEPS:**
-1. [Step 1 with explanation]
-2. [Step 2 with explanation]
-...
+        Only usable when RAG context was already prefetched: with the tool
+        call out of the way the remaining work is one chat completion, which
+        Mistral can stream over SSE. Perceived latency drops to
+        time-to-first-token instead of time-to-full-response; total wall
+        time is unchanged.
 
-**🎯 FINAL ANSWER:**
-[Clear final answer]
+        Yields answer text chunks as they arrive.
+        """
+        agent = _ROUTES[route]["agent"]
+        description = _task_description(route, user_query, prefetched_context)
+
+        messages = [
+            {"role": "system", "content": f"{agent.role}\n\n{agent.backstory}"},
+            {"role": "user", "content": description},
+        ]
+        response = litellm.completion(
+            model=get_llm().model,
+            api_key=MISTRAL_API_KEY,
+            messages=messages,
+            stream=True
+        )
+        for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    @staticmethod
+    def _fresh_crew(route: str, user_query: str):
+        """
+        Build an unshared crew for a single query.
 
-CRITICAL RULES:
-✓ You MUST call query_calculus_rag tool first
-✓ Show all mathematical steps
-✓ Explain reasoning for each step
-✓ Be clear about using LLM knowledge
-""",
-            agent=calculus_agent,
-            expected_output="Complete step-by-step calculus solution"
+        The cached crews from _executor_crew serialize concurrent callers
+        behind a per-crew lock; async/batch callers get their own crew so a
+        batch can actually run in parallel instead of queueing on the lock.
+        """
+        spec = _ROUTES[route]
+        task = Task(
+            description=_task_description(route, user_query),
+            agent=spec["agent"],
+            expected_output=spec["expected_output"]
         )
-
-        crew = Crew(
-            agents=[calculus_agent],
+        return Crew(
+            agents=[spec["agent"]],
             tasks=[task],
             process=Process.sequential,
             verbose=True
         )
-        
+
+    @staticmethod
+    async def execute_async(route: str, user_query: str):
+        """Async variant of execute_* - awaits the LLM instead of blocking."""
+        crew = Executor._fresh_crew(route, user_query)
         try:
-            print("\n🔄 EXECUTING CALCULUS QUERY")
-            result = crew.kickoff()
-            print("✅ QUERY EXECUTION COMPLETED\n")
-            return result
-            
+            return await crew.kickoff_async()
         except Exception as e:
             print(f"\n❌ ERROR: {str(e)}\n")
-            class ErrorResult:
-                def __init__(self, error_msg):
-                    self.raw = f"❌ Error executing query: {error_msg}"
-            return ErrorResult(str(e))
\ No newline at end of file
+            return ErrorResult(str(e))
+
+    @staticmethod
+    async def batch_execute(route_query_pairs):
+        """
+        Execute many (route, query) pairs concurrently with asyncio.gather.
+
+        All LLM calls are in flight at once, so the backend can batch them
+        server-side (raise OLLAMA_NUM_PARALLEL or vLLM --max-num-seqs so the
+        endpoint actually runs them in parallel).
+        """
+        coros = [
+            Executor.execute_async(route, query)
+            for route, query in route_query_pairs
+        ]
+        return await asyncio.gather(*coros)
+
+    @staticmethod
+    async def batch_answer(route_query_pairs, max_concurrency: int = 8):
+        """
+        Answer many routed queries as one LLM batch, bypassing crews.
+
+        RAG context for all discrete-math queries is retrieved in one
+        batched search, then every prompt goes through a shared
+        BatchScheduler so the backend sees the whole batch inside one
+        dispatch window and can exploit continuous batching.
+
+        Returns a list of answer strings in input order.
+        """
+        from batching import BatchScheduler
+        from rag_tool import query_discrete_math_rag_batch, query_calculus_rag
+
+        pairs = list(route_query_pairs)
+        scheduler = BatchScheduler(
+            model=get_llm().model,
+            api_key=MISTRAL_API_KEY,
+            max_concurrency=max_concurrency
+        )
+
+        # One batched embed+search covers every discrete-math query
+        dm_queries = [q for route, q in pairs if route == "discrete_math"]
+        dm_contexts = iter(
+            query_discrete_math_rag_batch(dm_queries) if dm_queries else []
+        )
+        calc_tool = getattr(query_calculus_rag, "func", None) or query_calculus_rag.run
+
+        coros = []
+        for route, query in pairs:
+            if route == "discrete_math":
+                context = next(dm_contexts)
+            else:
+                context = calc_tool(query)
+            agent = _ROUTES[route]["agent"]
+            messages = [
+                {"role": "system", "content": f"{agent.role}\n\n{agent.backstory}"},
+                {"role": "user", "content": _task_description(route, query, context)},
+            ]
+            coros.append(scheduler.submit(messages))
+
+        return await asyncio.gather(*coros)
\ No newline at end of file
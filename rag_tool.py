@@ -4,16 +4,156 @@ Fixed RAG Tool: Properly configured for ChromaDB.
 IMPORTANT: Collection names must be alphanumeric with underscores/hyphens only.
 """
 
+import functools
+import hashlib
+import logging
 import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
 from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
 from crewai.tools import tool
 from dotenv import load_dotenv
 from crewai import LLM
 
+# FAISS is optional: when available, similarity search runs on a FAISS index
+# built from the Chroma collection instead of Chroma's HNSW+SQLite path
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# PyMuPDF extracts text in C, typically 5-20x faster than the pure-Python
+# pypdf backend behind PyPDFLoader - the slowest cold-start step after
+# embedding; PyPDFLoader remains as the fallback
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Module logger: %-style lazy formatting means disabled levels cost one
+# level check instead of dozens of f-string builds and print syscalls per
+# retrieval (which dominate wall-time once the search itself is fast)
+logger = logging.getLogger(__name__)
+
+# Below this corpus size an exact flat scan (one BLAS matmul) is fastest;
+# above it, a compressed OPQ+IVF+PQ index gives sublinear search and a much
+# smaller memory footprint (and IVF has enough vectors to train on)
+ANN_IVF_PQ_THRESHOLD = 10000
+ANN_NPROBE = 16  # IVF cells probed per query - recall/latency knob
+
+# Scalar quantization for the flat index: fp16 (default) halves the bytes
+# touched per scan with negligible recall loss for MiniLM cosine similarity;
+# int8 cuts 4x for memory-constrained deployments at a small recall cost
+ANN_QUANT = os.getenv("RAG_ANN_QUANT", "fp16")
+
+# Agent loops often re-ask the same question within a session; a small LRU
+# over retrieval results skips the embed + search entirely on repeats
+RETRIEVAL_CACHE_SIZE = 256
+
+# Batch-encoding knobs: per-batch transformer cost is batch_size x
+# longest-sequence-in-batch (padding), so chunks are grouped into token-count
+# buckets before encoding. 256 tokens is ample for 800-char chunks and half
+# the padded compute of MiniLM's 512 default.
+ENCODE_BATCH_SIZE = 64
+ENCODE_MAX_TOKENS = 256
+ENCODE_BUCKETS = (64, 128, 192, 256)
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Chunking parameters: an 800-char window with 150-char overlap. Cuts prefer
+# the highest-priority separator present in the window: paragraph break,
+# then newline, then sentence end, then word boundary.
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+CHUNK_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# ChromaDB persistence settings (shared by the build and reuse paths)
+PERSIST_DIR = "./chroma_db"
+COLLECTION_NAME = "discrete_math_kb"
+
+# Storage backend: "faiss" keeps the whole KB as an in-memory FAISS index
+# (a few thousand vectors - one BLAS scan beats HNSW+SQLite round-trips at
+# this scale), "chroma" keeps ChromaDB as storage of record for large KBs
+RAG_BACKEND = os.getenv("RAG_BACKEND", "faiss" if faiss is not None else "chroma")
+FAISS_INDEX_FILE = Path(PERSIST_DIR) / f"{COLLECTION_NAME}.faiss"
+FAISS_META_FILE = Path(PERSIST_DIR) / f"{COLLECTION_NAME}_meta.pkl"
+
+# Content-addressed embedding cache: vectors keyed by a hash of the chunk
+# text survive PDF updates and chunk_size tweaks, so incremental rebuilds
+# only re-embed chunks whose text actually changed
+EMB_CACHE_FILE = Path(PERSIST_DIR) / "emb_cache.db"
+
+# HNSW parameters for the Chroma backend. Chroma's defaults (M=16,
+# construction_ef=100, search_ef=10) tune for QPS; at k=4 over a few
+# thousand chunks the bottleneck is recall, not speed, so raise M and the
+# ef values - missed relevant chunks cost answer quality, the extra graph
+# hops cost microseconds
+CHROMA_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 24,
+    "hnsw:construction_ef": 128,
+    "hnsw:search_ef": 80,
+}
+
+# Streamlit's cache_resource keeps heavy objects alive across script reruns
+# and source edits; outside Streamlit (batch scripts, CLI) fall back to a
+# plain per-process cache
+try:
+    import streamlit as _st
+    cache_resource = _st.cache_resource
+except ImportError:
+    def cache_resource(func):
+        return functools.lru_cache(maxsize=None)(func)
+
+
+# Dynamically quantized int8 ONNX export of the embedder; halves weight bytes
+# moved and uses int8 vector units on VNNI-capable CPUs
+EMBED_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+@cache_resource
+def _get_embedder():
+    """
+    Load the sentence-transformer embedding model once per process.
+
+    Prefers the int8-quantized ONNX Runtime backend (2-4x faster query
+    encoding on CPU); falls back to the default torch FP32 backend when the
+    onnx extra or the quantized export is unavailable.
+    """
+    logger.info("Initializing embeddings model...")
+    try:
+        embedder = SentenceTransformerEmbeddings(
+            model_name=EMBED_MODEL_NAME,
+            model_kwargs={
+                "backend": "onnx",
+                "model_kwargs": {"file_name": EMBED_ONNX_FILE}
+            }
+        )
+        # Fail here (not on the first user query) if the backend is broken
+        embedder.embed_query("backend check")
+        logger.info("Embeddings model loaded (int8 ONNX backend)")
+        return embedder
+    except Exception as e:
+        logger.warning("int8 ONNX embedder unavailable (%s), using default backend", str(e))
+
+    embedder = SentenceTransformerEmbeddings(model_name=EMBED_MODEL_NAME)
+    try:
+        # On CUDA, FP16 halves the forward-pass FLOP cost at no recall loss
+        import torch
+        if torch.cuda.is_available():
+            embedder.client.to("cuda").half()
+            logger.info("Embeddings model running in FP16 on CUDA")
+    except Exception:
+        pass
+    return embedder
+
 
 # config.py
 """
@@ -25,18 +165,54 @@ load_dotenv()
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MISTRAL_MODEL_NAME = os.getenv("MISTRAL_MODEL_NAME", "mistral-small-latest")
 
-if not MISTRAL_API_KEY:
-    raise ValueError("MISTRAL_API_KEY not found in environment variables")
 
-# Set environment variables for CrewAI
-os.environ["MISTRAL_API_KEY"] = MISTRAL_API_KEY
-os.environ["MISTRAL_MODEL_NAME"] = MISTRAL_MODEL_NAME
+@functools.lru_cache(maxsize=1)
+def get_llm() -> LLM:
+    """Shared Mistral LLM, constructed on first use (lazy singleton)."""
+    if not MISTRAL_API_KEY:
+        raise ValueError("MISTRAL_API_KEY not found in environment variables")
+
+    # Set environment variables for CrewAI
+    os.environ["MISTRAL_API_KEY"] = MISTRAL_API_KEY
+    os.environ["MISTRAL_MODEL_NAME"] = MISTRAL_MODEL_NAME
+
+    return LLM(
+        api_key=MISTRAL_API_KEY,
+        model=MISTRAL_MODEL_NAME
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_planner_llm() -> LLM:
+    """
+    Router-specific LLM: the planner only ever emits a tiny JSON object, so
+    constrain decoding to JSON and cap the completion length. Decode latency
+    is linear in generated tokens, so capping ~40 tokens of prose to a
+    minimal JSON object is a direct routing-latency win.
+    """
+    get_llm()  # validate the API key and set CrewAI env vars once
+    return LLM(
+        api_key=MISTRAL_API_KEY,
+        model=MISTRAL_MODEL_NAME,
+        temperature=0,
+        max_tokens=64,
+        response_format={"type": "json_object"}
+    )
+# Reuse ONE keep-alive HTTP connection pool for every Mistral call (planner,
+# executors, reflector). litellm opens per-call clients otherwise, paying a
+# TCP+TLS handshake per LLM invocation - a hidden serial cost that dwarfs
+# token compute for short completions like routing.
+try:
+    import httpx
+    import litellm
+    _HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32)
+    litellm.client_session = httpx.Client(limits=_HTTP_LIMITS)
+    litellm.aclient_session = httpx.AsyncClient(limits=_HTTP_LIMITS)
+    logger.info("Shared keep-alive HTTP session configured for LLM calls")
+except Exception as e:
+    logger.warning("Could not configure shared HTTP session: %s", str(e))
+
 
-# Initialize LLM (Mistral) - shared across all agents
-mistral_llm = LLM(
-    api_key=MISTRAL_API_KEY,
-    model=MISTRAL_MODEL_NAME
-)
 class RAGSystem:
     """Enhanced RAG system with proper ChromaDB configuration."""
     
@@ -44,93 +220,549 @@ class RAGSystem:
         self.vector_store = None # Vector store instance
         self.embeddings = None # Embeddings model
         self.db_initialized = False     # Flag to track initialization status
+        self.ann_index = None # FAISS index over the collection (optional)
+        self.ann_texts = [] # Chunk texts, parallel to FAISS ids
+        self.ann_metadatas = [] # Chunk metadata, parallel to FAISS ids
+        self._result_cache = OrderedDict() # LRU of successful retrievals
+        # The app's prefetch pool and crew tool calls hit this singleton
+        # from different threads; move_to_end/popitem must not interleave
+        self._cache_lock = threading.Lock()
         self.initialize_rag() # Initialize RAG on creation
     
     # initialize RAG system
     def initialize_rag(self):
-        """Initialize the RAG system with PDF documents."""
-        print(" Initializing RAG System...")
+        """
+        Initialize the RAG system.
+
+        Warm starts reuse the persisted ChromaDB collection and skip PDF
+        parsing and chunk embedding entirely (O(chunks) MiniLM forward
+        passes); only a missing or empty collection triggers a full build.
+        """
+        logger.info("Initializing RAG System...")
+
+        # Embeddings are needed by both the reuse and build paths
+        self.embeddings = _get_embedder()
+        logger.info("Embeddings model loaded")
+
+        if RAG_BACKEND == "faiss" and faiss is not None:
+            if self._open_existing_faiss():
+                self.db_initialized = True
+                self._warmup_encoder()
+                return
+        elif self._open_existing():
+            self._build_ann_index()
+            self.db_initialized = True
+            self._warmup_encoder()
+            return
+
+        self._build_from_pdf()
+        self._warmup_encoder()
+
+    def _warmup_encoder(self):
+        """
+        Prime the embedding model so the first user query skips the spike.
+
+        The first encode pays kernel compilation, CUDA context init, and
+        lazy tokenizer loads; running a throwaway encode at startup moves
+        that latency off the first user-facing query. Both the single-query
+        and batched paths are primed.
+        """
+        try:
+            self.embeddings.embed_query("warmup")
+            model = getattr(self.embeddings, "client", None)
+            if model is not None:
+                model.encode(["warmup"] * 8, batch_size=8,
+                             convert_to_numpy=True, show_progress_bar=False)
+            logger.info("Embedding model warmed up")
+        except Exception as e:
+            logger.warning("Encoder warmup failed: %s", str(e))
+
+    def _open_existing(self) -> bool:
+        """Open the persisted collection; returns True if it has data."""
+        try:
+            store = Chroma(
+                persist_directory=PERSIST_DIR,
+                collection_name=COLLECTION_NAME,
+                embedding_function=self.embeddings
+            )
+            count = store._collection.count()
+            if count > 0:
+                self.vector_store = store
+                logger.info(
+                    "Reusing persisted vector store (warm start): %d chunks "
+                    "in collection %s at %s", count, COLLECTION_NAME, PERSIST_DIR
+                )
+                return True
+        except Exception as e:
+            logger.warning("Could not open persisted vector store: %s", str(e))
+        return False
+
+    def _open_existing_faiss(self) -> bool:
+        """Load the persisted FAISS index + metadata; True on success."""
+        if not (FAISS_INDEX_FILE.exists() and FAISS_META_FILE.exists()):
+            return False
+        try:
+            index = faiss.read_index(str(FAISS_INDEX_FILE))
+            with open(FAISS_META_FILE, "rb") as f:
+                meta = pickle.load(f)
+            self.ann_index = self._maybe_to_gpu(index)
+            self.ann_texts = meta["texts"]
+            self.ann_metadatas = meta["metadatas"]
+            logger.info(
+                "Reusing persisted FAISS index (warm start): %d chunks from %s",
+                index.ntotal, FAISS_INDEX_FILE
+            )
+            return True
+        except Exception as e:
+            logger.warning("Could not load persisted FAISS index: %s", str(e))
+        return False
+
+    def _build_from_pdf(self):
+        """Cold start: parse the PDF, embed chunks, and persist the store."""
         # Path to discrete math PDF
         pdf_path = "data/DiscreteMath.pdf"
-        
+
         if not os.path.exists(pdf_path):
-            print(f" ERROR: PDF not found at {pdf_path}")
-            print("Please ensure the discrete_math.pdf file is in the data/ folder")
+            logger.error("PDF not found at %s - ensure the file is in the data/ folder", pdf_path)
             self.db_initialized = False
             return
         
         try:
             # Load PDF
-            print(f" Loading PDF from: {pdf_path}")
-            loader = PyPDFLoader(pdf_path) # Load PDF using PyPDFLoader
-            documents = loader.load() # Load all pages as documents
-            print(f" Loaded {len(documents)} pages from PDF")
+            logger.info("Loading PDF from: %s", pdf_path)
+            documents = self._load_pdf(pdf_path)
+            logger.info("Loaded %d pages from PDF", len(documents))
             
             if len(documents) == 0:
-                print(" ERROR: PDF has no pages")
+                logger.error("PDF has no pages")
                 self.db_initialized = False
                 return
             
             # Split documents into chunks
-            print("Splitting documents into chunks...")
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=800,
-                chunk_overlap=150,
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            chunks = splitter.split_documents(documents)
-            print(f"Created {len(chunks)} chunks from PDF")
+            logger.info("Splitting documents into chunks...")
+            chunks = self._split_documents(documents)
+            logger.info("Created %d chunks from PDF", len(chunks))
             
             if len(chunks) == 0:
-                print("ERROR: No chunks created")
+                logger.error("No chunks created")
                 self.db_initialized = False
                 return
-            
-            # Initialize embeddings
-            print("Initializing embeddings model...")
-            self.embeddings = SentenceTransformerEmbeddings(
-                model_name="all-MiniLM-L6-v2"
-            )
-            print("Embeddings model loaded")
-            
+
+            if RAG_BACKEND == "faiss" and faiss is not None:
+                # FAISS backend: the KB lives entirely in one index + a
+                # parallel texts/metadata list, no ChromaDB in the loop
+                logger.info("Creating FAISS vector store...")
+                self._build_faiss_store(
+                    [chunk.page_content for chunk in chunks],
+                    [chunk.metadata for chunk in chunks]
+                )
+                self.db_initialized = True
+                logger.info(
+                    "RAG system initialized: %d chunks indexed (FAISS, %s)",
+                    len(chunks), FAISS_INDEX_FILE
+                )
+                return
+
             # Create vector store
-            print("Creating vector store in ChromaDB...")
-            
+            logger.info("Creating vector store in ChromaDB...")
+
             # CRITICAL: Collection name must be alphanumeric with underscores/hyphens only
             # NO slashes, NO special characters except underscore and hyphen
-            self.vector_store = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                collection_name="discrete_math_kb",  # Valid collection name
-                persist_directory="./chroma_db"
-            )
-            
+            try:
+                # Batch-encode every chunk in one encode() call and add the
+                # vectors directly to the collection, bypassing the wrapper's
+                # per-document embed_documents path
+                texts = [chunk.page_content for chunk in chunks]
+                metadatas = [chunk.metadata for chunk in chunks]
+                embeddings = self._encode_texts_cached(texts)
+
+                self.vector_store = Chroma(
+                    persist_directory=PERSIST_DIR,
+                    collection_name=COLLECTION_NAME,
+                    embedding_function=self.embeddings,
+                    collection_metadata=CHROMA_HNSW_METADATA
+                )
+                self.vector_store._collection.add(
+                    ids=[str(i) for i in range(len(texts))],
+                    embeddings=embeddings.tolist(),
+                    documents=texts,
+                    metadatas=metadatas
+                )
+            except Exception as e:
+                logger.warning("Direct batched add failed (%s), using Chroma.from_documents", str(e))
+                self.vector_store = Chroma.from_documents(
+                    documents=chunks,
+                    embedding=self.embeddings,
+                    collection_name=COLLECTION_NAME,
+                    persist_directory=PERSIST_DIR,
+                    collection_metadata=CHROMA_HNSW_METADATA
+                )
+
+            # Persist explicitly (newer Chroma persists automatically; older
+            # langchain wrappers need the call)
+            try:
+                self.vector_store.persist()
+            except AttributeError:
+                pass
+
+            # Build the optional FAISS search layer over the stored vectors
+            self._build_ann_index()
+
             self.db_initialized = True
-            print("=" * 60)
-            print("RAG SYSTEM INITIALIZED SUCCESSFULLY")
-            print(f"Vector Store: {len(chunks)} chunks indexed")
-            print(f"Collection Name: discrete_math_kb")
-            print(f"Persist Directory: ./chroma_db")
-            print("=" * 60)
+            logger.info(
+                "RAG system initialized: %d chunks indexed in collection %s "
+                "at %s", len(chunks), COLLECTION_NAME, PERSIST_DIR
+            )
             
         except Exception as e:
-            print(f"ERROR initializing RAG: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("ERROR initializing RAG: %s", str(e))
             self.db_initialized = False
     
+    def _load_pdf(self, pdf_path):
+        """
+        Extract PDF pages as Documents, preferring PyMuPDF.
+
+        Page metadata matches what PyPDFLoader produces (page index and
+        source path), so the chunking and citation paths are unchanged.
+        """
+        if fitz is None:
+            logger.info("PyMuPDF not installed - loading via PyPDFLoader")
+            return PyPDFLoader(pdf_path).load()
+
+        with fitz.open(pdf_path) as pdf:
+            return [
+                Document(
+                    page_content=page.get_text("text"),
+                    metadata={"page": i, "source": pdf_path}
+                )
+                for i, page in enumerate(pdf)
+            ]
+
+    def _split_documents(self, documents):
+        """
+        Split documents into overlapping, separator-aligned chunks.
+
+        Walks each page with a CHUNK_SIZE-char window and CHUNK_OVERLAP
+        overlap, cutting at the last occurrence of the highest-priority
+        separator in the window (paragraph break before newline before
+        sentence end before space), mirroring the separator priority of
+        RecursiveCharacterTextSplitter with a fraction of the Python
+        overhead - the recursive splitter re-walks every document once per
+        separator level, while rfind scans at C speed.
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            n = len(text)
+            start = 0
+            while start < n:
+                end = min(start + CHUNK_SIZE, n)
+                if end < n:
+                    # Cut at the best separator present in the window:
+                    # a mid-window paragraph break beats a later space
+                    for sep in CHUNK_SEPARATORS:
+                        cut = text.rfind(sep, start, end)
+                        if cut > start:
+                            end = cut + len(sep)
+                            break
+                piece = text[start:end].strip()
+                if piece:
+                    chunks.append(Document(
+                        page_content=piece,
+                        metadata=dict(doc.metadata)
+                    ))
+                if end >= n:
+                    break
+                start = max(end - CHUNK_OVERLAP, start + 1)
+        return chunks
+
+    def _encode_texts(self, texts):
+        """
+        Batch-encode texts with the raw SentenceTransformer.
+
+        Texts are tokenized once and grouped into token-count buckets, then
+        each bucket is encoded with large batches: batching similar lengths
+        together avoids padding short chunks up to the longest one in the
+        batch, and large encode() calls amortize tokenizer and dispatch
+        overhead. Falls back to the LangChain wrapper when the underlying
+        model is not exposed.
+        """
+        model = getattr(self.embeddings, "client", None)
+        if model is None:
+            return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+        texts = list(texts)
+        try:
+            model.max_seq_length = min(
+                getattr(model, "max_seq_length", ENCODE_MAX_TOKENS) or ENCODE_MAX_TOKENS,
+                ENCODE_MAX_TOKENS
+            )
+            lengths = model.tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=True,
+                max_length=ENCODE_MAX_TOKENS,
+                return_length=True
+            )["length"]
+        except Exception as e:
+            logger.warning("Length bucketing unavailable (%s), encoding unbucketed", str(e))
+            return np.asarray(model.encode(
+                texts,
+                batch_size=ENCODE_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+
+        # Group indices by the smallest bucket that fits; truncation caps
+        # everything at the last bucket
+        buckets = {cap: [] for cap in ENCODE_BUCKETS}
+        for idx, n_tokens in enumerate(lengths):
+            for cap in ENCODE_BUCKETS:
+                if n_tokens <= cap:
+                    buckets[cap].append(idx)
+                    break
+            else:
+                buckets[ENCODE_BUCKETS[-1]].append(idx)
+
+        # Encode per bucket and scatter vectors back into original order
+        result = None
+        for cap in ENCODE_BUCKETS:
+            idxs = buckets[cap]
+            if not idxs:
+                continue
+            vecs = np.asarray(model.encode(
+                [texts[i] for i in idxs],
+                batch_size=ENCODE_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+            if result is None:
+                result = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            result[idxs] = vecs
+        return result
+
+    def _encode_texts_cached(self, texts):
+        """
+        Content-addressed wrapper around _encode_texts for the build path.
+
+        Vectors are persisted in SQLite keyed by blake2b(chunk_text);
+        hashing runs at ~1 GB/s, so a hit skips the MiniLM forward pass
+        essentially for free. Only cache misses are encoded, then upserted
+        for the next rebuild.
+        """
+        texts = list(texts)
+        try:
+            os.makedirs(PERSIST_DIR, exist_ok=True)
+            con = sqlite3.connect(str(EMB_CACHE_FILE))
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS emb_cache (key TEXT PRIMARY KEY, vec BLOB)"
+            )
+        except Exception as e:
+            logger.warning("Embedding cache unavailable (%s), encoding all chunks", str(e))
+            return self._encode_texts(texts)
+
+        try:
+            keys = [
+                hashlib.blake2b(t.encode("utf-8"), digest_size=16).hexdigest()
+                for t in texts
+            ]
+
+            # Bulk lookup in slices that stay under SQLite's parameter limit
+            cached = {}
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                cached.update(con.execute(
+                    f"SELECT key, vec FROM emb_cache WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall())
+
+            miss_idxs = [i for i, key in enumerate(keys) if key not in cached]
+            if miss_idxs:
+                miss_vecs = self._encode_texts([texts[i] for i in miss_idxs])
+                con.executemany(
+                    "INSERT OR REPLACE INTO emb_cache (key, vec) VALUES (?, ?)",
+                    [(keys[i], vec.tobytes())
+                     for i, vec in zip(miss_idxs, miss_vecs)]
+                )
+                con.commit()
+                for i, vec in zip(miss_idxs, miss_vecs):
+                    cached[keys[i]] = vec
+
+            hits = len(texts) - len(miss_idxs)
+            if hits:
+                logger.info("Embedding cache: reused %d/%d chunk vectors",
+                            hits, len(texts))
+
+            result = None
+            for i, key in enumerate(keys):
+                vec = cached[key]
+                if isinstance(vec, (bytes, memoryview)):
+                    vec = np.frombuffer(vec, dtype=np.float32)
+                if result is None:
+                    result = np.empty((len(texts), vec.shape[0]), dtype=np.float32)
+                result[i] = vec
+            return result
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed (%s), encoding all chunks", str(e))
+            return self._encode_texts(texts)
+        finally:
+            con.close()
+
+    def _build_faiss_store(self, texts, metadatas):
+        """Encode chunks, build the FAISS index, and persist it to disk."""
+        embs = self._encode_texts_cached(texts)
+        faiss.normalize_L2(embs)
+        index = self._make_faiss_index(embs)
+
+        # Persist the CPU index + lookup tables for warm starts
+        os.makedirs(PERSIST_DIR, exist_ok=True)
+        faiss.write_index(index, str(FAISS_INDEX_FILE))
+        with open(FAISS_META_FILE, "wb") as f:
+            pickle.dump({"texts": texts, "metadatas": metadatas}, f)
+
+        self.ann_index = self._maybe_to_gpu(index)
+        self.ann_texts = texts
+        self.ann_metadatas = metadatas
+        logger.info("FAISS search index built over %d vectors (dim=%d)",
+                    embs.shape[0], embs.shape[1])
+
+    def _make_faiss_index(self, embs):
+        """Build and populate a CPU FAISS index sized to the corpus."""
+        n, dim = embs.shape
+
+        if n >= ANN_IVF_PQ_THRESHOLD:
+            # Large corpus: compressed sublinear index (OPQ + IVF + PQ).
+            # Scale the IVF list count with corpus size - faiss wants ~39
+            # training points per centroid, so a fixed nlist=4096 would be
+            # badly undertrained near the threshold (10k points over 4096
+            # lists is ~2.4 each); n//64 keeps a comfortable margin and
+            # reaches 4096 lists only past ~262k vectors
+            nlist = max(64, min(4096, n // 64))
+            index = faiss.index_factory(
+                dim, f"OPQ32,IVF{nlist},PQ32", faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embs)
+            faiss.extract_index_ivf(index).nprobe = ANN_NPROBE
+        else:
+            # Small corpus: exact flat scan over scalar-quantized vectors -
+            # the scan is memory-bound, so fewer bytes per vector is a
+            # near-linear speedup
+            qtype = (faiss.ScalarQuantizer.QT_8bit if ANN_QUANT == "int8"
+                     else faiss.ScalarQuantizer.QT_fp16)
+            index = faiss.IndexScalarQuantizer(
+                dim, qtype, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embs)
+
+        index.add(embs)
+        return index
+
+    def _maybe_to_gpu(self, index):
+        """Move an index to GPU 0 when faiss-gpu and a device are present."""
+        # The GPU cloner has no kernel for a standalone scalar-quantizer
+        # index (this repo's small-corpus default); attempting the transfer
+        # would raise and log a warning on every startup, so keep SQ on the
+        # CPU - a few-thousand-vector fp16 scan is microseconds there anyway
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            return index
+        if hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0:
+            try:
+                index = faiss.index_cpu_to_gpu(
+                    faiss.StandardGpuResources(), 0, index
+                )
+                logger.info("FAISS index transferred to GPU 0")
+            except Exception as e:
+                logger.warning("FAISS GPU transfer failed, staying on CPU: %s", str(e))
+        return index
+
+    def _build_ann_index(self):
+        """
+        Build a FAISS index over the Chroma collection for fast search.
+
+        Vectors are pulled straight from the persisted collection (no
+        re-embedding) and unit-normalized so inner product equals cosine
+        similarity. Rebuild on startup is cheap and ChromaDB remains the
+        storage of record; FAISS is purely a search accelerator.
+        """
+        if faiss is None:
+            logger.info("faiss not installed - keeping ChromaDB search path")
+            return
+
+        try:
+            data = self.vector_store._collection.get(
+                include=["embeddings", "documents", "metadatas"]
+            )
+            embs = np.asarray(data["embeddings"], dtype=np.float32)
+            if embs.ndim != 2 or embs.shape[0] == 0:
+                logger.info("No stored embeddings found - keeping ChromaDB search path")
+                return
+
+            faiss.normalize_L2(embs)
+            index = self._make_faiss_index(embs)
+
+            self.ann_index = self._maybe_to_gpu(index)
+            self.ann_texts = data["documents"]
+            self.ann_metadatas = data["metadatas"]
+            logger.info("FAISS search index built over %d vectors (dim=%d)",
+                        embs.shape[0], embs.shape[1])
+
+        except Exception as e:
+            logger.warning("FAISS index build failed, using ChromaDB search: %s", str(e))
+            self.ann_index = None
+
+    def _ann_search(self, query: str, k: int):
+        """Search the FAISS index; returns (Document, score) pairs."""
+        q_vec = np.asarray(
+            self.embeddings.embed_query(query), dtype=np.float32
+        )[None, :]
+        faiss.normalize_L2(q_vec)
+        scores, ids = self.ann_index.search(q_vec, k)
+
+        results = []
+        for score, idx in zip(scores[0], ids[0]):
+            if idx < 0:  # FAISS pads missing results with -1
+                continue
+            doc = Document(
+                page_content=self.ann_texts[idx],
+                metadata=self.ann_metadatas[idx] or {}
+            )
+            results.append((doc, float(score)))
+        return results
+
+    def _chroma_search(self, query: str, k: int):
+        """
+        Query the Chroma collection directly; returns (Document, score) pairs.
+
+        Encodes the query once through the cached embedder and hands the
+        vector straight to the collection, skipping the LangChain wrapper's
+        per-call re-embedding and result post-processing.
+        """
+        q_vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        res = self.vector_store._collection.query(
+            query_embeddings=[q_vec.tolist()],
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        results = []
+        for text, metadata, distance in zip(
+                res["documents"][0], res["metadatas"][0], res["distances"][0]):
+            doc = Document(page_content=text, metadata=metadata or {})
+            # Chroma returns distances; convert to a relevance-style score
+            results.append((doc, 1.0 - float(distance)))
+        return results
+
     def retrieve_context(self, query: str, k: int = 4):
         """
         Retrieve relevant chunks from vector store.
         """
-        print("\n" + "=" * 60)
-        print(f"SEARCHING VECTOR STORE")
-        print(f"Query: {query}")
-        print("=" * 60)
+        logger.info("Searching vector store | query: %s", query)
         
-        if not self.db_initialized or not self.vector_store:
+        if not self.db_initialized or (not self.vector_store and self.ann_index is None):
             error_msg = "RAG system not initialized. Cannot retrieve from vector store."
-            print(error_msg)
+            logger.error(error_msg)
             return {
                 "context": "",
                 "sources": [],
@@ -138,19 +770,30 @@ class RAGSystem:
                 "message": error_msg,
                 "chunks_found": 0
             }
-        
+
+        # Repeated questions skip the embed + search entirely
+        cache_key = (query.strip().lower(), k)
+        with self._cache_lock:
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                self._result_cache.move_to_end(cache_key)
+        if cached is not None:
+            logger.info("Retrieval cache hit - returning cached result")
+            return dict(cached)
+
         try:
-            # Perform similarity search
-            print(f"Searching for top {k} similar chunks...")
-            docs_with_scores = self.vector_store.similarity_search_with_relevance_scores(
-                query, k=k
-            )
+            # Perform similarity search (FAISS layer when built, else Chroma)
+            logger.debug("Searching for top %d similar chunks...", k)
+            if self.ann_index is not None:
+                docs_with_scores = self._ann_search(query, k)
+            else:
+                docs_with_scores = self._chroma_search(query, k)
             
-            print(f"Retrieved {len(docs_with_scores)} chunks from vector store")
+            logger.info("Retrieved %d chunks from vector store", len(docs_with_scores))
             
             if not docs_with_scores or len(docs_with_scores) == 0:
                 no_results_msg = "Vector store returned 0 results."
-                print(no_results_msg)
+                logger.warning(no_results_msg)
                 return {
                     "context": "",
                     "sources": [],
@@ -159,57 +802,20 @@ class RAGSystem:
                     "chunks_found": 0
                 }
             
-            # Process retrieved chunks
-            context_parts = []
-            sources = []
-            
-            print(f"\nProcessing {len(docs_with_scores)} retrieved chunks:\n")
-            
-            for i, (doc, score) in enumerate(docs_with_scores):
-                metadata = doc.metadata
-                page = metadata.get('page', 'Unknown')
-                source_name = metadata.get('source', 'discrete_math.pdf')
-                
-                print(f"  Chunk {i+1}: Page {page}, Relevance Score: {score:.3f}")
-                print(f"  Preview: {doc.page_content[:100]}...\n")
-                
-                # Build context
-                context_parts.append(
-                    f"\n{'='*70}\n"
-                    f"SOURCE {i+1} | Page {page} | Relevance: {score:.2f}\n"
-                    f"{'='*70}\n"
-                    f"{doc.page_content}\n"
-                    f"{'='*70}\n"
-                )
-                
-                # Store source metadata
-                sources.append({
-                    "number": i + 1,
-                    "file_name": os.path.basename(source_name),
-                    "page": page,
-                    "relevance_score": round(score, 3),
-                    "preview": doc.page_content[:150].replace('\n', ' ') + "..."
-                })
-            
-            full_context = "\n".join(context_parts)
-            
-            success_msg = f"Successfully retrieved {len(docs_with_scores)} chunks from knowledge base"
-            print(f"\n{success_msg}")
-            print("=" * 60 + "\n")
-            
-            return {
-                "context": full_context, # Full retrieved context
-                "sources": sources, # List of source metadata
-                "rag_used": True, # Indicate RAG retrieval was used
-                "message": success_msg, # Status message
-                "chunks_found": len(docs_with_scores)   # Number of chunks found
-            }
-            
+            result = self._package_results(docs_with_scores)
+
+            # Cache only successful retrievals; errors and empty results
+            # should be retried on the next call
+            with self._cache_lock:
+                self._result_cache[cache_key] = dict(result)
+                if len(self._result_cache) > RETRIEVAL_CACHE_SIZE:
+                    self._result_cache.popitem(last=False)
+
+            return result
+
         except Exception as e:
             error_msg = f"Error during vector store retrieval: {str(e)}"
-            print(error_msg)
-            import traceback # for detailed error logging
-            traceback.print_exc() # print stack trace
+            logger.exception(error_msg)
             return {
                 "context": "", # No context on error
                 "sources": [], # No sources on error
@@ -218,10 +824,106 @@ class RAGSystem:
                 "chunks_found": 0   # No chunks found
             }
 
-# Global RAG instance
-print("INITIALIZING GLOBAL RAG SYSTEM")
-# Create a single RAG system instance for use in tools
-rag_system = RAGSystem()
+    def retrieve_context_batch(self, queries, k: int = 4):
+        """
+        Retrieve context for many queries with one batched embed + search.
+
+        Encoding all queries in a single call and issuing one FAISS search
+        over the stacked matrix amortizes tokenizer and dispatch overhead;
+        falls back to per-query retrieval when the FAISS layer is absent.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        if not self.db_initialized or self.ann_index is None:
+            return [self.retrieve_context(q, k) for q in queries]
+
+        try:
+            q_mat = np.asarray(
+                self.embeddings.embed_documents(queries), dtype=np.float32
+            )
+            faiss.normalize_L2(q_mat)
+            scores, ids = self.ann_index.search(q_mat, k)
+        except Exception as e:
+            logger.warning("Batched retrieval failed, falling back to per-query: %s", str(e))
+            return [self.retrieve_context(q, k) for q in queries]
+
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            docs_with_scores = []
+            for score, idx in zip(row_scores, row_ids):
+                if idx < 0:
+                    continue
+                doc = Document(
+                    page_content=self.ann_texts[idx],
+                    metadata=self.ann_metadatas[idx] or {}
+                )
+                docs_with_scores.append((doc, float(score)))
+
+            if docs_with_scores:
+                results.append(self._package_results(docs_with_scores))
+            else:
+                results.append({
+                    "context": "",
+                    "sources": [],
+                    "rag_used": False,
+                    "message": "Vector store returned 0 results.",
+                    "chunks_found": 0
+                })
+        return results
+
+    def _package_results(self, docs_with_scores):
+        """Build the retrieval response dict from (doc, score) pairs."""
+        context_parts = []
+        sources = []
+
+        for i, (doc, score) in enumerate(docs_with_scores):
+            metadata = doc.metadata
+            page = metadata.get('page', 'Unknown')
+            source_name = metadata.get('source', 'discrete_math.pdf')
+
+            # Per-chunk previews are debug-only; slicing and formatting them
+            # on every call is pure overhead when nobody is reading them
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Chunk %d: Page %s, Relevance %.3f | Preview: %s...",
+                             i + 1, page, score, doc.page_content[:100])
+
+            # Build context: one header line per chunk is enough for the LLM
+            context_parts.append(
+                f"SOURCE {i+1} | Page {page} | Relevance: {score:.2f}\n"
+                f"{doc.page_content}"
+            )
+
+            # Store source metadata
+            sources.append({
+                "number": i + 1,
+                "file_name": os.path.basename(source_name),
+                "page": page,
+                "relevance_score": round(score, 3),
+                "preview": doc.page_content[:150].replace('\n', ' ') + "..."
+            })
+
+        full_context = ("\n" + "=" * 70 + "\n").join(context_parts)
+
+        success_msg = f"Successfully retrieved {len(docs_with_scores)} chunks from knowledge base"
+        logger.info(success_msg)
+
+        return {
+            "context": full_context, # Full retrieved context
+            "sources": sources, # List of source metadata
+            "rag_used": True, # Indicate RAG retrieval was used
+            "message": success_msg, # Status message
+            "chunks_found": len(docs_with_scores)   # Number of chunks found
+        }
+
+# RAG construction is deferred to first use: importing this module no longer
+# pays PDF parsing, embedding-model load, or index open - processes that only
+# need the tool definitions (tests, CLI help, forked workers) stay cheap
+@cache_resource
+def get_rag_system() -> RAGSystem:
+    """Shared RAG system, constructed on first use (lazy singleton)."""
+    logger.info("INITIALIZING GLOBAL RAG SYSTEM")
+    return RAGSystem()
 
 # RAG Tool for Discrete Math
 @tool("query_discrete_math_rag")
@@ -236,67 +938,107 @@ def query_discrete_math_rag(query: str) -> str:
     Returns:
         String containing retrieved context and source information
     """
-    result = rag_system.retrieve_context(query, k=4)
-    
-    # Format response as a clear string for the agent
-    if result["rag_used"]:
-        response = f"""
+    result = get_rag_system().retrieve_context(query, k=4)
+    return _format_rag_response(result)
+
+
+def query_discrete_math_rag_batch(queries, k: int = 4):
+    """
+    Batched variant of query_discrete_math_rag for multi-query workloads.
+
+    Embeds all queries in one encoder call and issues a single index search,
+    then formats each result exactly like the single-query tool.
+
+    Args:
+        queries: List of discrete math questions to search for
+        k: Number of chunks to retrieve per query
+
+    Returns:
+        List of formatted context strings, one per query
+    """
+    results = get_rag_system().retrieve_context_batch(queries, k=k)
+    return [_format_rag_response(result) for result in results]
+
+
+# Static framing for the tool responses, built once at import; per call only
+# the dynamic fields are formatted and the pieces joined
+_BAR = "━" * 60
+
+_SUCCESS_HEADER = f"""
 RAG RETRIEVAL SUCCESSFUL
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{_BAR}
 
-Status: {result['message']}
-Chunks Retrieved: {result['chunks_found']}
+Status: {{message}}
+Chunks Retrieved: {{chunks_found}}
 
 RETRIEVED CONTEXT FROM KNOWLEDGE BASE:
-{result['context']}
+{{context}}
 
 SOURCES:
 """
-        for src in result['sources']:
-            response += f"\n[{src['number']}] {src['file_name']} - Page {src['page']} (Relevance: {src['relevance_score']})"
-            response += f"\n    Preview: {src['preview']}\n"
-        
-        response += f"""
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_SUCCESS_FOOTER = f"""
+{_BAR}
 
 IMPORTANT: You MUST base your answer on the context above from the knowledge base.
 Do NOT use general LLM knowledge. Cite the sources in your response.
 """
-        return response
-    else:
-        return f"""
+
+_FAILURE_TEMPLATE = f"""
 RAG RETRIEVAL FAILED
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{_BAR}
 
-Status: {result['message']}
+Status: {{message}}
 Chunks Retrieved: 0
 
-Since no context was retrieved from the knowledge base, you may use 
-general LLM knowledge to answer this question. However, clearly state that 
+Since no context was retrieved from the knowledge base, you may use
+general LLM knowledge to answer this question. However, clearly state that
 you are using LLM knowledge and not the knowledge base.
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{_BAR}
+"""
+
+
+def _format_rag_response(result) -> str:
+    """Format a retrieval result dict as a clear string for the agent."""
+    if result["rag_used"]:
+        parts = [_SUCCESS_HEADER.format(
+            message=result['message'],
+            chunks_found=result['chunks_found'],
+            context=result['context']
+        )]
+        # Single join instead of repeated += (O(n^2) on source count)
+        parts.extend(
+            f"\n[{src['number']}] {src['file_name']} - Page {src['page']} (Relevance: {src['relevance_score']})"
+            f"\n    Preview: {src['preview']}\n"
+            for src in result['sources']
+        )
+        parts.append(_SUCCESS_FOOTER)
+        return "".join(parts)
+    return _FAILURE_TEMPLATE.format(message=result['message'])
+
+# RAG Tool for Calculus (No KB yet) - fully static response, built once
+_CALCULUS_RESPONSE = f"""
+CALCULUS KNOWLEDGE BASE STATUS
+{_BAR}
+
+Status: Calculus knowledge base is not yet implemented
+Chunks Retrieved: 0
+
+You may use general LLM knowledge to answer calculus questions.
+Please state clearly that you are using LLM general knowledge.
+{_BAR}
 """
 
-# RAG Tool for Calculus (No KB yet)
+
 @tool("query_calculus_rag")
 def query_calculus_rag(query: str) -> str:
     """
     Query calculus knowledge base (not yet implemented).
-    
+
     Args:
         query: The calculus question
-    
+
     Returns:
         Information about calculus KB availability
     """
-    return """
-CALCULUS KNOWLEDGE BASE STATUS
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Status: Calculus knowledge base is not yet implemented
-Chunks Retrieved: 0
-
-You may use general LLM knowledge to answer calculus questions.
-Please state clearly that you are using LLM general knowledge.
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
\ No newline at end of file
+    return _CALCULUS_RESPONSE
\ No newline at end of file
@@ -3,73 +3,122 @@
 Reflector: Performs quality assessment and introspection on answers.
 """
 
-from crewai import Crew, Task, Process
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 from agents import reflective_agent
+from rag_tool import get_llm
 
-class Reflector:
-    """Handles quality assessment and reflection on mathematical answers."""
-    
-    # method to evaluate answer quality
-    @staticmethod
-    def evaluate_answer(user_query: str, answer: str, route: str):
-        """
-        Evaluate the quality of a mathematical answer. Do self-critique and introspection.
-        
-        Metrics from 0-100:
-        - Correctness : Mathematical accuracy
-        - Clarity : Clear explanation
-        - Completeness : Comprehensive coverage
-        - Presentation : Proper notation and formatting
-        - Confidence : how confident the model is in its answer
-        
-        Returns quality score (0-100) and feedback.
-        """
-        
-        task = Task(
-            description=f"""
+# Reflection cost grows linearly with prompt length, and multi-page answers
+# can make it dominate pipeline latency and API spend. The head plus tail of
+# a long answer is enough to judge correctness, clarity, and formatting.
+MAX_QUERY_CHARS = 500
+ANSWER_HEAD_CHARS = 2000
+ANSWER_TAIL_CHARS = 1000
+
+# Evaluation prompt; the static framing is built once and formatted with the
+# per-call question/answer/route
+_EVAL_TEMPLATE = """
             Evaluate the quality of this mathematical answer:
-            
+
             ORIGINAL QUESTION:
             {user_query}
-            
+
             ANSWER PROVIDED ({route}):
             {answer}
-            
+
             Assess the answer based on these criteria: from 0 to 100%
             1. Correctness : Is the mathematics accurate and valid?
             2. Clarity : Is the explanation clear and easy to follow?
             3. Completeness : Does it fully address the question?
             4. Presentation : Is the notation proper and formatting good?
-            
+
             Provide your evaluation in this format:
-            
+
             QUALITY SCORE: [0-100]
-            
+
             DETAILED BREAKDOWN:
             - Correctness : [score] - [brief comment]
             - Clarity : [score] - [brief comment]
             - Completeness : [score] - [brief comment]
             - Presentation : [score] - [brief comment]
             Confidence : [score]- [brief comment]
-            
+
             STRENGTHS:
             - [List key strengths]
-            
+
             AREAS FOR IMPROVEMENT:
             - [List specific suggestions]
-            
+
             OVERALL ASSESSMENT:
             [Brief summary of the answer quality]
-            """,
-            agent=reflective_agent,
-            expected_output="Quality score and detailed evaluation"
-        )
+            """
+
 
-        crew = Crew(
-            agents=[reflective_agent], # Single agent for reflection
-            tasks=[task], # Single task
-            process=Process.sequential, # Sequential processing
-            verbose=False  # No need for verbose in reflection
+def _truncate_answer(answer: str) -> str:
+    """Keep the head and tail of a long answer, marking the elision."""
+    if len(answer) <= ANSWER_HEAD_CHARS + ANSWER_TAIL_CHARS:
+        return answer
+    return (
+        f"{answer[:ANSWER_HEAD_CHARS]}\n\n"
+        f"[... middle of answer omitted for evaluation ...]\n\n"
+        f"{answer[-ANSWER_TAIL_CHARS:]}"
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _reflection_pool():
+    """Background pool for reflection calls, shared per process."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="reflection")
+
+
+class Reflector:
+    """Handles quality assessment and reflection on mathematical answers."""
+
+    # method to evaluate answer quality
+    @staticmethod
+    def evaluate_answer(user_query: str, answer: str, route: str):
+        """
+        Evaluate the quality of a mathematical answer. Do self-critique and introspection.
+
+        Metrics from 0-100:
+        - Correctness : Mathematical accuracy
+        - Clarity : Clear explanation
+        - Completeness : Comprehensive coverage
+        - Presentation : Proper notation and formatting
+        - Confidence : how confident the model is in its answer
+
+        Returns quality score (0-100) and feedback.
+        """
+        # Single-shot, single-agent, no-tool evaluation: call the LLM
+        # directly instead of spinning up Crew orchestration around one
+        # HTTP request (the agent persona becomes the system prompt)
+        return get_llm().call(messages=[
+            {
+                "role": "system",
+                "content": f"{reflective_agent.role}\n\n{reflective_agent.backstory}"
+            },
+            {
+                "role": "user",
+                "content": _EVAL_TEMPLATE.format(
+                    user_query=user_query[:MAX_QUERY_CHARS],
+                    answer=_truncate_answer(answer),
+                    route=route
+                )
+            },
+        ])
+
+    @staticmethod
+    def evaluate_answer_async(user_query: str, answer: str, route: str):
+        """
+        Run evaluate_answer in the background; returns a Future.
+
+        The score and feedback are orthogonal to delivering the answer, so
+        callers can render the answer immediately and collect the result
+        later - future.result() when the score is needed, or
+        future.add_done_callback(...) to persist it - dropping the blocking
+        reflection call out of user-visible latency.
+        """
+        return _reflection_pool().submit(
+            Reflector.evaluate_answer, user_query, answer, route
         )
-        # Kickoff the crew to execute the task
-        return crew.kickoff()
\ No newline at end of file